@@ -0,0 +1,73 @@
+# benchmarks/import_time.py
+# Josh Reed
+#
+# Measures how long a fresh python process takes to import the dispatch client and construct a client,
+# and how many modules that pulls in. Each case is run in its own interpreter so nothing is cached.
+#
+# Usage: python benchmarks/import_time.py [runs]
+
+# Base python
+import subprocess
+import statistics
+import sys
+import os
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+
+# Each case is a snippet run after the interpreter has started. It must print the number of loaded modules.
+CASES = {
+	'baseline (empty interpreter)': "",
+	'import dispatch_client': "import dispatch_client_py.dispatch_client",
+	'construct DispatchClient (requests transport)':
+		"from dispatch_client_py.dispatch_client import DispatchClient\n"
+		"DispatchClient('http://localhost', verbose=False)",
+	'construct DispatchClient (http.client transport)':
+		"from dispatch_client_py.dispatch_client import DispatchClient\n"
+		"from dispatch_client_py.transport import HttpClientTransport\n"
+		"DispatchClient('http://localhost', verbose=False, transport=HttpClientTransport())",
+	'import requests (old import-time cost)': "import requests",
+}
+
+TIMED = (
+	"import sys, time\n"
+	"t_start = time.perf_counter()\n"
+	"{snippet}\n"
+	"t_end = time.perf_counter()\n"
+	"print(t_end - t_start, len(sys.modules), 'requests' in sys.modules)\n"
+)
+
+def run_case(snippet, runs):
+	"""Run a snippet in fresh interpreters and time it.
+
+	Args:
+		snippet (str): Python code to time
+		runs (int): How many interpreters to run it in
+
+	Returns:
+		tuple: (median seconds, number of loaded modules, bool requests loaded), or None if the snippet failed.
+	"""
+	env = dict(os.environ)
+	env['PYTHONPATH'] = SRC_DIR + os.pathsep + env.get('PYTHONPATH', '')
+
+	times = []
+	for _ in range(runs):
+		p = subprocess.run(
+			[sys.executable, '-c', TIMED.format(snippet=snippet)],
+			env=env, capture_output=True, text=True)
+		if(p.returncode != 0):
+			return None
+		t, n_modules, has_requests = p.stdout.split()
+		times.append(float(t))
+	return statistics.median(times), int(n_modules), has_requests == 'True'
+
+if __name__ == '__main__':
+	runs = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+
+	print("Median of " + str(runs) + " fresh interpreters per case:")
+	for name, snippet in CASES.items():
+		out = run_case(snippet, runs)
+		if(out is None):
+			print("  {:<50} (failed, module not installed?)".format(name))
+			continue
+		t, n_modules, has_requests = out
+		print("  {:<50} {:8.2f} ms  {:4d} modules  requests loaded: {}".format(name, t * 1000, n_modules, has_requests))
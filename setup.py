@@ -15,6 +15,13 @@ import glob
 #	Add permanent data to backend sends
 # 0.2.0
 #	Modernize setup.py
+# 0.3.0
+#	Bound frontend functions live in a registry with precompiled argument validation and call stats
+#	client_functions is now a DispatchFunctionRegistry. It still reads like a dict, but its values are
+#	BoundFunction's (the original function is at .fn) and functions must be bound with client_bind_function()
+#	Results of server-instigated calls with a call_id are returned to the server in batches
+#	Add call_server_function_conditional() for ETag revalidation and merge-patch deltas
+#	Import requests lazily and add an optional http.client transport with keep-alive
 
 # Lessons from https://blog.ionelmc.ro/2014/05/25/python-packaging/
 
@@ -22,7 +29,7 @@ setup(
 	# This is NOT the module name e.g. 'import dispatch_client_py'. This is the library name as
 	# it would appear in pip etc.
 	name='dispatch_client_py',
-	version='0.2.0',
+	version='0.3.0',
 	license='GNUv3',
 	description='A python-based client with methods used to communicate with a dispatch server instance over HTTP.',
 	author='Josh Reed (henryotoole)',
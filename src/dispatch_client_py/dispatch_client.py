@@ -1,25 +1,27 @@
 # dispatch_client_py/dispatch_client.py
 # Josh Reed
 #
-# A dispatch foreign client which is built in python using the popular requests module.
+# A dispatch foreign client which is built in python using the popular requests module. The requests module
+# is only imported once the first request is sent, and can be swapped out entirely for a lighter transport.
 
 # Our code
 from dispatch_client_py.exceptions import DispatchResponseErrorException, DispatchResponseTimeoutException
 from dispatch_client_py.exceptions import DispatchClientException, DispatchServerException
-
-# Other libraries
-import requests
+from dispatch_client_py.exceptions import DispatchArgumentException
+from dispatch_client_py.function_registry import DispatchFunctionRegistry
+from dispatch_client_py.result_cache import DispatchResultCache, merge_patch, copy_json
+from dispatch_client_py.transport import RequestsTransport
 
 # Base python
 import time
 import random
 import string
-import urllib
+import urllib.parse
 import json
 
 class DispatchClient:
 
-	def __init__(self, server_domain, dispatch_route='/_dispatch', client_name='py', verbose=True):
+	def __init__(self, server_domain, dispatch_route='/_dispatch', client_name='py', verbose=True, transport=None):
 		"""Initialize a dispatch client which can communicate with a central dispatch server. This client will be assigned
 		a unique session id and all requests to the server will have this ID associated with it.
 		This client adheres to the JSONRPC 2.0 standard for communication.
@@ -31,6 +33,8 @@ class DispatchClient:
 			client_name (str, optional): The name given to this client. This name can be used to designate
 				a series of clients under one project namespace. Default is 'py'
 			verbose (bool, optional): Whether or not to print log messages. Default is True
+			transport (object, optional): The transport used to send HTTP requests. Default is a RequestsTransport.
+				Use an HttpClientTransport to avoid importing the requests module at all.
 		"""		
 
 		# Main variables
@@ -39,6 +43,7 @@ class DispatchClient:
 		self.verbose = verbose
 		self.logger = None
 		self.session_id = self.gen_session_id()
+		self.transport = transport if transport is not None else RequestsTransport()
 
 		# The foreign type indicates to the backend from what client comes a poll request (js, python, etc)
 		self.client_name = client_name
@@ -47,8 +52,15 @@ class DispatchClient:
 		self.base_data = {} 
 		self.headers = {}
 		
-		# Frontend functions bound with client.bind(fn) will be stored here by key: function_name
-		self.client_functions = {}
+		# Frontend functions bound with client_bind_function(fn) are stored here by key: function_name
+		self.client_functions = DispatchFunctionRegistry()
+
+		# Results of server-instigated calls which are waiting to be sent back to the server. Each is a
+		# dict of form {'call_id': call_id, 'result': *} or {'call_id': call_id, 'error': error_object}
+		self.client_results_pending = []
+
+		# Results of call_server_function_conditional() are stored here so they can be revalidated.
+		self.result_cache = DispatchResultCache()
 
 		# These cookies will be sent with every request.
 		self._cookies = {}
@@ -75,12 +87,105 @@ class DispatchClient:
 			DispatchResponseErrorException if the server responds with a JSONRPC 2.0 error
 			DispatchResponseTimeoutException if the request times out
 			DispatchClientException if the client has not been configured correctly (400's)
+			DispatchConnectionException (a DispatchClientException) if the server could not be reached
 			DispatchServerException if the server had an issue (500 error, etc.)
 			ValueError for unhandled codes.
 
 		Returns:
 			*:	This will be the JSONRPC 'result' object, which can be anything
 		"""
+		r_data = self._send_call(function_name, args)
+
+		result = r_data.get('result')
+		error = r_data.get('error')
+		if result is not None:
+			return result
+		if error is not None:
+			raise DispatchResponseErrorException(error)
+
+	def call_server_function_conditional(self, function_name, *args, copy=False):
+		"""Call a function on the dispatch backend, but let the server skip sending the result if it has not
+		changed since the last call with the same arguments. This is useful for functions which return large
+		results that rarely change.
+
+		The client sends the ETag of its stored result as '__dispatch__etag'. Along with the normal JSONRPC
+		response, the server may reply with:
+			'__dispatch__etag': The ETag of the current result. Results without one are not stored.
+			'__dispatch__not_modified': True if the stored result is still current. No 'result' is sent.
+			'__dispatch__delta': A JSON Merge Patch (RFC 7396) which turns the stored result into the
+				current one. No 'result' is sent.
+		Servers which know nothing of this simply send the full result every time.
+
+		By default the returned result is the very object held in the result cache, so a 'not modified'
+		response costs nothing no matter how large the result is. That object is shared and must be treated
+		as read-only. Modifying it would corrupt the cache and every delta applied on top of it later. Pass
+		copy=True to get a private copy instead, at the cost of one pass over the whole result per call.
+
+		WARNING: This function will block until the request completes.
+
+		Args:
+			function_name (str): The name of the function on the backend to call
+			...args (*): Any number of arguments to provide to the backend function. Keyword arguments are not supported.
+			copy (bool, optional): Return a private copy of the result that may be modified. Default is False
+
+		Raises:
+			The same exceptions as call_server_function()
+
+		Returns:
+			*:	This will be the JSONRPC 'result' object, which can be anything
+		"""
+		key = self.result_cache.key(function_name, args)
+		entry = self.result_cache.get(key)
+
+		extra_data = {}
+		if(entry is not None):
+			extra_data['__dispatch__etag'] = entry[0]
+
+		r_data = self._send_call(function_name, args, extra_data)
+
+		error = r_data.get('error')
+		if error is not None:
+			raise DispatchResponseErrorException(error)
+
+		etag = r_data.get('__dispatch__etag')
+
+		if(r_data.get('__dispatch__not_modified') or '__dispatch__delta' in r_data):
+			if(entry is None):
+				raise ValueError("Server sent a conditional response for '" + str(function_name) + "', but no result is stored.")
+			if(r_data.get('__dispatch__not_modified')):
+				result = entry[1]
+			else:
+				result = merge_patch(entry[1], r_data['__dispatch__delta'])
+		else:
+			result = r_data.get('result')
+
+		if(etag is None):
+			self.result_cache.discard(key)
+		else:
+			self.result_cache.put(key, etag, result)
+
+		if(copy):
+			return copy_json(result)
+		return result
+
+	def _send_call(self, function_name, args, extra_data=None):
+		"""Send a JSONRPC call to the dispatch backend and check the response code.
+
+		Args:
+			function_name (str): The name of the function on the backend to call
+			args (list): The arguments to provide to the backend function
+			extra_data (dict, optional): Extra key/value pairs to send along with the request. Defaults to None.
+
+		Raises:
+			DispatchResponseTimeoutException if the request times out
+			DispatchClientException if the client has not been configured correctly (400's)
+			DispatchConnectionException (a DispatchClientException) if the server could not be reached
+			DispatchServerException if the server had an issue (500 error, etc.)
+			ValueError for unhandled codes or a 200 response with no data.
+
+		Returns:
+			dict: The full JSONRPC response object
+		"""
 
 		# Pack all arguments into a JSON string
 		params = urllib.parse.quote(json.dumps(args))
@@ -94,24 +199,22 @@ class DispatchClient:
 			'id': self.session_id,
 			'__dispatch__permanent_data': permanent_data
 		}
+		if(extra_data):
+			data.update(extra_data)
 
 		# Debug info
-		debug_datastring = json.dumps(data)
-		mlen = min(len(debug_datastring), 256) # The length of the datastring or 256, whichever is smaller.
-		self.log_debug("Calling " + str(function_name) + " with " + debug_datastring[:mlen])
+		if(self.verbose):
+			debug_datastring = json.dumps(data)
+			mlen = min(len(debug_datastring), 256) # The length of the datastring or 256, whichever is smaller.
+			self.log_debug("Calling " + str(function_name) + " with " + debug_datastring[:mlen])
 
-		# Use requests module to send request.
+		# Use the transport to send request.
 		r_code, r_data = self.get_json(self.dispatch_url, self.prep_data(data))
 
 		if r_code == 200:
 			if r_data is None:
 				raise ValueError("Server responded with code 200, but with no data.")
-			result = r_data.get('result')
-			error = r_data.get('error')
-			if result is not None:
-				return result
-			if error is not None:
-				raise DispatchResponseErrorException(error)
+			return r_data
 		elif r_code == None:
 			raise DispatchResponseTimeoutException()
 		elif r_code >= 300 and r_code < 500:
@@ -122,7 +225,7 @@ class DispatchClient:
 			raise ValueError("Unhandled server response code: " + str(r_code))
 
 	def get_json(self, url, data, files={}):
-		"""Use the requests module to send a request to Dispatch. This will block until either the timeout
+		"""Use the transport to send a request to Dispatch. This will block until either the timeout
 		is reached or the request returns. In the future I'd like to upgrade this to be more of a promise
 		using python's await features.
 
@@ -136,27 +239,22 @@ class DispatchClient:
 				404, "File not found" or perhaps
 				200, {'json_key', 1} <--- note that this is an actual dict, not a string.
 			If the request times out, the tuple (None, None) is returned.
+		Raises:
+			DispatchConnectionException if the server could not be reached.
 		"""
+		r = self.transport.post(url, data, files, self.request_timeout, self._cookies, self.headers)
+		if(r is None):
+			self.log_debug('Dispatch request has timed out after ' + str(self.request_timeout) + ' seconds.')
+			return None, None # Connection timed out, so no code or JSON
+
+		self._last_request = r
+		if(r.status_code != 200):
+			self.log_debug("Dispatch request returns non-200 code <" + str(r.status_code) + "> - Debug Info: '" + r.text + "'")
+			return r.status_code, None # Return the status code and None to signify it wasn't a 200
 		try:
-			r = requests.post(
-				url, data=data,
-				files=files,
-				timeout=self.request_timeout,
-				cookies=self._cookies,
-				allow_redirects=False,
-				verify=False,
-				headers=self.headers)
-			self._last_request = r
-			if(r.status_code != 200):
-				self.log_debug("Dispatch request returns non-200 code <" + str(r.status_code) + "> - Debug Info: '" + r.text + "'")
-				return r.status_code, None # Return the status code and None to signify it wasn't a 200
-			try:
-				return 200, r.json() # Return the JSON and the 200 code
-			except ValueError as e:
-				return 200, None # No JSON parseable, but we still got a 200
-		except (requests.exceptions.ConnectTimeout):
-			self.log_debug('Dispatch request has timed out (or had a ConnectionError) after ' + str(self.request_timeout) + ' seconds.')
-		return None, None # Connection timed out, so no code or JSON
+			return 200, r.json() # Return the JSON and the 200 code
+		except ValueError as e:
+			return 200, None # No JSON parseable, but we still got a 200
 
 	def polling_set_frequency(self, interval):
 		"""Set the the frequency at which polls will be made.
@@ -207,68 +305,171 @@ class DispatchClient:
 	
 	def _polling_function(self):
 		"""Call the general polling function on the dispatch server to see if this session has any
-		new info for us.
+		new info for us. Any pending results from previous server-instigated calls are sent along with
+		the poll.
+
+		Raises:
+			The same exceptions as call_server_function(), or the first exception raised by a bound function
+			which was called without a call_id. All queued functions are called either way.
 		"""
 
-		result = self.call_server_function('__dispatch__client_poll', self.session_id, self.client_name)
+		# Take the pending results now, so that results produced by this poll go out with the next one.
+		results = self.client_results_pending
+		self.client_results_pending = []
+
+		try:
+			if(len(results) > 0):
+				result = self.call_server_function('__dispatch__client_poll', self.session_id, self.client_name, results)
+			else:
+				result = self.call_server_function('__dispatch__client_poll', self.session_id, self.client_name)
+		except Exception:
+			# Results were not delivered, so put them back in front of anything new.
+			self.client_results_pending = results + self.client_results_pending
+			raise
 
 		function_blocks = result.get('queued_functions', [])
 
 		# Function blocks is a list of form: 'queued_functions': [{
 		#	'fname': fname,
 		#	'args': args,
+		#	'call_id': call_id,	<--- Optional. If provided the server wants the result back.
 		#	}, {...}, ...],
 
+		# The server has already dequeued every block, so one failing block must not stop the rest from
+		# running. The first error is raised once all blocks have been handled.
+		first_error = None
 		for function_block in function_blocks:
-			self.client_call_bound_function(function_block.get('fname'), function_block.get('args'))
+			try:
+				self.client_call_bound_function(
+					function_block.get('fname'),
+					function_block.get('args'),
+					function_block.get('call_id')
+				)
+			except Exception as e:
+				self.log("Warning: Frontend function '" + str(function_block.get('fname')) + "' raised " + type(e).__name__ + ": " + str(e))
+				if(first_error is None): first_error = e
+
+		if(first_error is not None):
+			raise first_error
+
+	def client_flush_results(self):
+		"""Send all pending results of server-instigated calls back to the server in one batched request,
+		rather than waiting for the next poll. Does nothing if there are no pending results.
+
+		Raises:
+			The same exceptions as call_server_function(). Results are kept for the next attempt if so.
+		"""
+		if(len(self.client_results_pending) == 0):
+			return
+
+		results = self.client_results_pending
+		self.client_results_pending = []
+		try:
+			self.call_server_function('__dispatch__client_results', self.session_id, results)
+		except Exception:
+			self.client_results_pending = results + self.client_results_pending
+			raise
 	
-	def client_call_bound_function(self, function_name, args):
+	def client_call_bound_function(self, function_name, args, call_id=None):
 		"""Call a function which has been bound using client_bind_function(). This is generally called by
-		polling when the server instigates a function call.
+		polling when the server instigates a function call. Calls to unbound functions or with arguments
+		that fail validation are logged and dropped before the function is run.
+
+		If a call_id is provided, the return value of the function (or the error it caused) is queued up
+		to be sent back to the server with that call_id. See _polling_function() and client_flush_results().
 
 		Args:
 			function_name (str): The name of the function to call
 			args (list): A list of arguments to be provided to the function when we call it 
+			call_id (*, optional): The server's correlation ID for this call. Default is None, in which
+				case the result is thrown away.
 		"""	
-		fn = self.client_functions.get(function_name)
+		bound = self.client_functions.get(function_name)
 
-		if(fn is None):
-			self.log("Warning: Server attempted to call unbound frontend function '" + function_name + "'")
+		if(bound is None):
+			self.log("Warning: Server attempted to call unbound frontend function '" + str(function_name) + "'")
+			self._queue_error(call_id, -32601, "Frontend function '" + str(function_name) + "' is not bound.")
 			return
 
-		print_args = str(args)
-		if(len(print_args) > 256): print_args = print_args[0:256] + "..."
+		if(self.verbose):
+			print_args = str(args)
+			if(len(print_args) > 256): print_args = print_args[0:256] + "..."
+			self.log_debug("Calling frontend function: " + function_name + " with " + print_args)
 
-		self.log_debug("Calling frontend function: " + function_name + " with " + print_args)
+		try:
+			result = bound.call(args)
+		except DispatchArgumentException as e:
+			self.log("Warning: " + str(e))
+			self._queue_error(call_id, -32602, str(e))
+			return
+		except Exception as e:
+			if(call_id is None):
+				raise
+			self.log("Warning: Frontend function '" + function_name + "' raised " + type(e).__name__ + ": " + str(e))
+			self._queue_error(call_id, -32000, str(e), type(e).__name__)
+			return
 
-		fn(*args) # Call the function with the args.
+		if(call_id is None):
+			return
 
-		# TODO In the future I'd like to add some sort of callback mechanism, but that will require some
-		# extra hoops on the server.
+		# Catch unserializable results now, or else they would break every poll that follows.
+		try:
+			json.dumps(result)
+		except (TypeError, ValueError) as e:
+			self._queue_error(call_id, -32603, "Result of frontend function '" + function_name + "' is not JSON serializable: " + str(e))
+			return
+
+		self.client_results_pending.append({'call_id': call_id, 'result': result})
+
+	def _queue_error(self, call_id, code, message, data=None):
+		"""Queue up a JSONRPC format error object to be sent back to the server for a call. Does nothing
+		if the call had no call_id.
+
+		Args:
+			call_id (*): The server's correlation ID for this call
+			code (int): JSONRPC error code
+			message (str): Description of the error
+			data (*, optional): Any further info on the error. Defaults to None.
+		"""
+		if(call_id is None):
+			return
+		self.client_results_pending.append({
+			'call_id': call_id,
+			'error': {'code': code, 'message': message, 'data': data}
+		})
 		
-	def client_bind_function(self, frontend_fn, function_name=None):
-		"""Bind a function to this client so the server can call it. For now, the return value of this
-		function is entirely ignored.
+	def client_bind_function(self, frontend_fn, function_name=None, arg_schema=None):
+		"""Bind a function to this client so the server can call it. The return value of this function
+		is sent back to the server only if the server provided a call_id when calling it.
 
 		Args:
 			frontend_fn (function): The function to be called, with some sort of 'self' context bound
 			function_name (str, optional): function_name: Can be provided to set a specific name for a function.
 				This must be provided for anon functions. Default is to use the given name of the provided function.
+			arg_schema (list, optional): A per-argument list of types or converters which server provided
+				arguments are checked against before the function is called. See DispatchFunctionRegistry.bind()
 		"""
-	
-		if(function_name is None): function_name = frontend_fn.func_name
-		
-		# If the function was anonymous or did not have a name, use the optional one provided by user
-		if(function_name is None or function_name == ""):
-			raise ValueError("Provided function had no base name (possible anonymous function?). Use the kwarg 'function_name'.")
-			
-		self.log_debug("Binding dispatch callable function '" + str(function_name))
+		function_name = self.client_functions.bind(frontend_fn, function_name, arg_schema)
+		self.log_debug("Binding dispatch callable function '" + str(function_name) + "'")
 
-		# Can't bind if it's already bound...
-		if(self.client_functions.get(function_name)):
-			raise ValueError("A function has already been bound to name " + str(function_name))
-		
-		self.client_functions[function_name] = frontend_fn
+	def client_bind_members(self, target):
+		"""Bind every member of an object or module which has been marked with the @dispatch_callable
+		decorator, so the server can call them.
+
+		Args:
+			target (object): An object instance or module whose marked members should be bound.
+		"""
+		for function_name in self.client_functions.bind_members(target):
+			self.log_debug("Binding dispatch callable function '" + str(function_name) + "'")
+
+	def client_function_stats(self):
+		"""Get invocation counts and latencies for all bound frontend functions.
+
+		Returns:
+			dict: By key: function_name, a dict of form {'calls', 'rejected', 'errors', 'total_time', 'max_time'}
+				where times are in seconds.
+		"""
+		return self.client_functions.stats()
 		
 	def prep_data(self, request_data, prevent_caching=True):
 		"""Modify a post request data block to have any base_data and perhaps to prevent caching.
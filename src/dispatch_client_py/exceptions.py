@@ -46,4 +46,28 @@ class DispatchServerException(Exception):
 		
 		msg = "Server returns code " + str(error_code) + " when attempting to send dispatch request. Check that server is configured correctly."
 
-		super().__init__(msg)
\ No newline at end of file
+		super().__init__(msg)
+
+class DispatchArgumentException(Exception):
+	"""Raised when the server calls a bound frontend function with arguments that do not
+	match its signature or argument schema.
+	"""
+
+	def __init__(self, function_name, reason):
+
+		self.function_name = function_name
+		msg = "Server called frontend function '" + str(function_name) + "' with bad arguments: " + str(reason)
+
+		super().__init__(msg)
+
+class DispatchConnectionException(DispatchClientException):
+	"""Raised when a dispatch server request could not be made at all, because the connection was
+	refused, dropped or the host could not be found. Every transport raises this for such failures.
+	"""
+
+	def __init__(self, reason):
+
+		msg = "Could not connect to dispatch server: " + str(reason)
+
+		# Skip DispatchClientException's message, which is about response codes.
+		Exception.__init__(self, msg)
\ No newline at end of file
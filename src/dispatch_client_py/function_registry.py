@@ -0,0 +1,370 @@
+# dispatch_client_py/function_registry.py
+# Josh Reed
+#
+# The registry which holds all frontend functions that the server is allowed to call on this client.
+# Argument checks are compiled once at bind time so that a server call only costs a dict lookup and
+# a handful of isinstance() checks before the bound function is run.
+
+# Our code
+from dispatch_client_py.exceptions import DispatchArgumentException
+
+# Base python
+import time
+
+# Attribute name used by the dispatch_callable() decorator to mark functions for bind_members()
+_MARKER_ATTR = '_dispatch_callable'
+
+def dispatch_callable(fn=None, function_name=None, arg_schema=None):
+	"""Decorator which marks a function or method as callable by the server. Marked members of an object
+	or module can then all be bound at once with DispatchFunctionRegistry.bind_members(). The function
+	itself is returned unchanged.
+
+	Can be used bare (@dispatch_callable) or with arguments (@dispatch_callable(function_name='x')).
+
+	Args:
+		fn (function, optional): The function to mark. Provided automatically when used bare.
+		function_name (str, optional): The name the server will use to call this function. Default is
+			the name of the function.
+		arg_schema (list, optional): A per-argument schema. See DispatchFunctionRegistry.bind()
+
+	Returns:
+		function: The function provided, or a decorator if no function was provided.
+	"""
+	def mark(fn):
+		setattr(fn, _MARKER_ATTR, {'function_name': function_name, 'arg_schema': arg_schema})
+		return fn
+
+	if(fn is None):
+		return mark
+	return mark(fn)
+
+class DispatchFunctionRegistry:
+
+	def __init__(self):
+		"""Initialize a registry which maps function names to bound frontend functions. Each bound function
+		has an argument validator which is compiled at bind time, and keeps count of how many times it has
+		been called and how long those calls took.
+		"""
+		# BoundFunction instances by key: function_name
+		self.functions = {}
+
+	def bind(self, fn, function_name=None, arg_schema=None):
+		"""Bind a function to this registry so the server can call it.
+
+		The arg_schema, if provided, is a list with one entry per positional argument:
+			None: The argument is accepted as-is.
+			type or tuple of types: The argument must be an instance of this type (e.g. int, (int, float)).
+				JSON booleans are not accepted as int unless bool is also given.
+			callable: A converter, called with the raw argument. Its return value is handed to the bound
+				function instead. Any exception it raises rejects the argument.
+		Arguments beyond the end of the schema are accepted as-is.
+
+		Args:
+			fn (function): The function to be called, with some sort of 'self' context bound
+			function_name (str, optional): The name the server will use to call this function. This must
+				be provided for anon functions. Default is to use the given name of the provided function.
+			arg_schema (list, optional): The per-argument schema described above. Default is to only check
+				the number of arguments against the function signature.
+
+		Raises:
+			ValueError if no name could be determined, if the name is already bound or if the arg_schema
+				is invalid.
+
+		Returns:
+			str: The name the function was bound to.
+		"""
+		if(function_name is None):
+			function_name = getattr(fn, '__name__', None)
+
+		# Lambdas all share the name '<lambda>', so they must be given a name explicitly.
+		if(function_name is None or function_name == "" or function_name == "<lambda>"):
+			raise ValueError("Provided function had no base name (possible anonymous function?). Use the kwarg 'function_name'.")
+
+		if(function_name in self.functions):
+			raise ValueError("A function has already been bound to name " + str(function_name))
+
+		self.functions[function_name] = BoundFunction(fn, function_name, arg_schema)
+		return function_name
+
+	def bind_members(self, target):
+		"""Bind every member of an object or module which was marked with the @dispatch_callable decorator.
+
+		Members are looked up statically, so properties and other descriptors on the target are never
+		evaluated. Only marked members are actually fetched from the target. For a module, marked functions
+		which were imported from some other module are skipped.
+
+		Args:
+			target (object): An object instance or module whose marked members should be bound.
+
+		Returns:
+			list: The names of all functions that were bound.
+		"""
+		# inspect is slow to import and only needed at bind time.
+		import inspect
+
+		is_module = inspect.ismodule(target)
+
+		bound_names = []
+		for attr_name in dir(target):
+			try:
+				static = inspect.getattr_static(target, attr_name)
+			except AttributeError:
+				continue
+
+			# staticmethod and classmethod wrappers carry the marker on the function they wrap.
+			marker = getattr(static, _MARKER_ATTR, None)
+			if(marker is None):
+				marker = getattr(getattr(static, '__func__', None), _MARKER_ATTR, None)
+			if(marker is None):
+				continue
+
+			if(is_module and getattr(static, '__module__', None) != target.__name__):
+				continue
+
+			member = getattr(target, attr_name)
+			if(not callable(member)):
+				continue
+			bound_names.append(self.bind(member, marker['function_name'], marker['arg_schema']))
+		return bound_names
+
+	def unbind(self, function_name):
+		"""Remove a bound function from this registry. Safe to call even if the name is not bound.
+
+		Args:
+			function_name (str): The name of the function to unbind
+		"""
+		self.functions.pop(function_name, None)
+
+	def get(self, function_name):
+		"""Get a bound function by name.
+
+		Args:
+			function_name (str): The name of the bound function
+
+		Returns:
+			BoundFunction: The bound function, or None if nothing is bound to this name.
+		"""
+		return self.functions.get(function_name)
+
+	def stats(self):
+		"""Get the invocation statistics for all bound functions.
+
+		Returns:
+			dict: By key: function_name, a dict of form {'calls', 'rejected', 'errors', 'total_time', 'max_time'}
+				where times are in seconds.
+		"""
+		return {name: bound.stats() for name, bound in self.functions.items()}
+
+	def keys(self):
+		return self.functions.keys()
+
+	def values(self):
+		return self.functions.values()
+
+	def items(self):
+		return self.functions.items()
+
+	def __getitem__(self, function_name):
+		return self.functions[function_name]
+
+	def __iter__(self):
+		return iter(self.functions)
+
+	def __contains__(self, function_name):
+		return function_name in self.functions
+
+	def __len__(self):
+		return len(self.functions)
+
+class BoundFunction:
+
+	__slots__ = ('fn', 'function_name', 'validate', 'calls', 'rejected', 'errors', 'total_time', 'max_time')
+
+	def __init__(self, fn, function_name, arg_schema=None):
+		"""A single function bound to a registry, along with its precompiled argument validator and
+		invocation statistics. See DispatchFunctionRegistry.bind() for the arg_schema format.
+
+		Args:
+			fn (function): The function to be called
+			function_name (str): The name this function is bound to
+			arg_schema (list, optional): The per-argument schema. Defaults to None.
+		"""
+		self.fn = fn
+		self.function_name = function_name
+		self.validate = _compile_validator(fn, function_name, arg_schema)
+
+		self.calls = 0			# Number of times the function was actually run
+		self.rejected = 0		# Number of calls rejected by the validator
+		self.errors = 0			# Number of calls which raised an exception
+		self.total_time = 0.0	# Total seconds spent inside the function
+		self.max_time = 0.0		# Longest single call, in seconds
+
+	def call(self, args):
+		"""Validate the provided arguments and call the bound function with them.
+
+		Args:
+			args (list): The arguments provided by the server
+
+		Raises:
+			DispatchArgumentException if the arguments do not match the function or its schema.
+			Anything that the bound function itself raises.
+
+		Returns:
+			*: Whatever the bound function returns.
+		"""
+		try:
+			args = self.validate(args)
+		except DispatchArgumentException:
+			self.rejected += 1
+			raise
+
+		t_start = time.perf_counter()
+		try:
+			return self.fn(*args)
+		except Exception:
+			self.errors += 1
+			raise
+		finally:
+			elapsed = time.perf_counter() - t_start
+			self.calls += 1
+			self.total_time += elapsed
+			if(elapsed > self.max_time): self.max_time = elapsed
+
+	def stats(self):
+		"""Get the invocation statistics for this function.
+
+		Returns:
+			dict: Of form {'calls', 'rejected', 'errors', 'total_time', 'max_time'} where times are in seconds.
+		"""
+		return {
+			'calls': self.calls,
+			'rejected': self.rejected,
+			'errors': self.errors,
+			'total_time': self.total_time,
+			'max_time': self.max_time,
+		}
+
+def _get_arity(fn):
+	"""Determine how many positional arguments a function will accept.
+
+	Args:
+		fn (function): The function to inspect
+
+	Returns:
+		tuple: (min_args, max_args) where max_args is None if there is no upper limit. If the signature
+			can not be inspected (some builtins) this will be (0, None).
+	"""
+	# inspect is slow to import and only needed at bind time.
+	import inspect
+
+	try:
+		params = inspect.signature(fn).parameters.values()
+	except (TypeError, ValueError):
+		return 0, None
+
+	min_args = 0
+	max_args = 0
+	for param in params:
+		if(param.kind == param.VAR_POSITIONAL):
+			max_args = None
+		elif(param.kind in (param.POSITIONAL_ONLY, param.POSITIONAL_OR_KEYWORD)):
+			if(max_args is not None): max_args += 1
+			if(param.default is param.empty): min_args += 1
+	return min_args, max_args
+
+def _compile_check(function_name, index, spec):
+	"""Turn a single arg_schema entry into a function which checks (and perhaps converts) one argument.
+
+	Args:
+		function_name (str): The name of the bound function, for error messages
+		index (int): The index of the argument, for error messages
+		spec (*): The schema entry. See DispatchFunctionRegistry.bind()
+
+	Raises:
+		ValueError if the schema entry is not valid.
+
+	Returns:
+		function: A function of form check(arg) -> arg, or None if the argument should be accepted as-is.
+	"""
+	if(spec is None):
+		return None
+
+	if(isinstance(spec, type) or isinstance(spec, tuple)):
+		types = spec if isinstance(spec, tuple) else (spec,)
+		if(len(types) == 0 or not all(isinstance(t, type) for t in types)):
+			raise ValueError("Invalid arg_schema entry for function '" + str(function_name) + "' at index " + str(index) + ": " + str(spec))
+
+		# bool is a subclass of int, but a JSON true/false is almost never meant to pass as a number.
+		reject_bool = int in types and bool not in types
+
+		def check_type(arg):
+			if(not isinstance(arg, types) or (reject_bool and isinstance(arg, bool))):
+				raise DispatchArgumentException(function_name,
+					"argument " + str(index) + " must be " + str(spec) + ", got " + str(type(arg)))
+			return arg
+		return check_type
+
+	if(callable(spec)):
+		def check_convert(arg):
+			try:
+				return spec(arg)
+			except Exception as e:
+				raise DispatchArgumentException(function_name,
+					"argument " + str(index) + " was rejected by converter: " + type(e).__name__ + ": " + str(e))
+		return check_convert
+
+	raise ValueError("Invalid arg_schema entry for function '" + str(function_name) + "' at index " + str(index) + ": " + str(spec))
+
+def _compile_validator(fn, function_name, arg_schema):
+	"""Build the validator for a bound function. All inspection of the function and its schema happens
+	here, once, so that the returned validator does as little work as possible per call.
+
+	Args:
+		fn (function): The bound function
+		function_name (str): The name of the bound function, for error messages
+		arg_schema (list): The per-argument schema, or None
+
+	Returns:
+		function: A function of form validate(args) -> args which raises DispatchArgumentException if the
+			args are not acceptable.
+	"""
+	min_args, max_args = _get_arity(fn)
+
+	checks = ()
+	if(arg_schema is not None):
+		if(max_args is not None and len(arg_schema) > max_args):
+			raise ValueError("arg_schema for function '" + str(function_name) + "' has " + str(len(arg_schema)) +
+				" entries, but the function takes at most " + str(max_args) + " arguments")
+		checks = tuple(_compile_check(function_name, i, spec) for i, spec in enumerate(arg_schema))
+		# Trailing 'accept as-is' entries need not be checked at all.
+		while(len(checks) > 0 and checks[-1] is None):
+			checks = checks[:-1]
+
+	def validate(args):
+		if(args is None):
+			args = []
+		elif(not isinstance(args, list)):
+			raise DispatchArgumentException(function_name, "arguments must be a list, got " + str(type(args)))
+
+		n_args = len(args)
+		if(n_args < min_args or (max_args is not None and n_args > max_args)):
+			if(max_args is None):
+				expected = str(min_args) + " or more"
+			elif(max_args == min_args):
+				expected = str(min_args)
+			else:
+				expected = str(min_args) + " to " + str(max_args)
+			raise DispatchArgumentException(function_name,
+				"expected " + expected + " arguments, got " + str(n_args))
+
+		if(not checks):
+			return args
+
+		args = list(args)
+		for i, check in enumerate(checks):
+			if(i >= n_args): break
+			if(check is not None):
+				args[i] = check(args[i])
+		return args
+
+	return validate
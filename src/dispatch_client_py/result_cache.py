@@ -0,0 +1,123 @@
+# dispatch_client_py/result_cache.py
+# Josh Reed
+#
+# A local store of server function results, used for conditional requests. The client sends the ETag of
+# its stored result and the server may answer with 'not modified' or a JSON Merge Patch (RFC 7396) delta
+# rather than the whole result again.
+
+# Base python
+from collections import OrderedDict
+import json
+
+class DispatchResultCache:
+
+	def __init__(self, max_entries=64):
+		"""Initialize a least-recently-used store of server function results keyed by function name and
+		arguments. Each stored result has the ETag the server gave it.
+
+		Args:
+			max_entries (int, optional): How many results to keep before the least recently used
+				is dropped. Default is 64
+		"""
+		self.max_entries = max_entries
+
+		# Tuples of form (etag, result) by key: see key()
+		self._entries = OrderedDict()
+
+	def key(self, function_name, args):
+		"""Get the cache key for a call to a server function.
+
+		Args:
+			function_name (str): The name of the server function
+			args (list): The arguments the function was called with. Must be JSON serializable.
+
+		Returns:
+			str: The key
+		"""
+		return function_name + ":" + json.dumps(args, sort_keys=True)
+
+	def get(self, key):
+		"""Get a stored result and mark it as recently used.
+
+		Args:
+			key (str): The cache key
+
+		Returns:
+			tuple: (etag, result), or None if nothing is stored for this key.
+		"""
+		entry = self._entries.get(key)
+		if(entry is not None):
+			self._entries.move_to_end(key)
+		return entry
+
+	def put(self, key, etag, result):
+		"""Store a result, dropping the least recently used result if the cache is full.
+
+		Args:
+			key (str): The cache key
+			etag (str): The ETag the server gave this result
+			result (*): The full result
+		"""
+		self._entries[key] = (etag, result)
+		self._entries.move_to_end(key)
+		while(len(self._entries) > self.max_entries):
+			self._entries.popitem(last=False)
+
+	def discard(self, key):
+		"""Drop a stored result. Safe to call even if nothing is stored for this key.
+
+		Args:
+			key (str): The cache key
+		"""
+		self._entries.pop(key, None)
+
+	def clear(self):
+		"""Drop all stored results.
+		"""
+		self._entries.clear()
+
+	def __len__(self):
+		return len(self._entries)
+
+def merge_patch(target, patch):
+	"""Apply a JSON Merge Patch (RFC 7396) to a JSON document. The target is not modified. Only the
+	parts of the document which the patch touches are copied, the rest is shared with the target.
+
+	Args:
+		target (*): The JSON document to patch
+		patch (*): The merge patch. A dict is merged key by key, where a None value removes the key.
+			Anything else replaces the target outright.
+
+	Returns:
+		*: The patched document.
+	"""
+	if(not isinstance(patch, dict)):
+		return patch
+
+	if(isinstance(target, dict)):
+		result = dict(target)
+	else:
+		result = {}
+
+	for key, value in patch.items():
+		if(value is None):
+			result.pop(key, None)
+		else:
+			result[key] = merge_patch(result.get(key), value)
+	return result
+
+def copy_json(doc):
+	"""Deep copy a JSON document. This is much faster than copy.deepcopy() as it only has to deal with the
+	types that JSON decodes to.
+
+	Args:
+		doc (*): The JSON document
+
+	Returns:
+		*: A copy which shares no dicts or lists with the original.
+	"""
+	if(isinstance(doc, dict)):
+		return {key: copy_json(value) for key, value in doc.items()}
+	if(isinstance(doc, list)):
+		return [copy_json(value) for value in doc]
+	return doc
@@ -0,0 +1,262 @@
+# dispatch_client_py/transport.py
+# Josh Reed
+#
+# The HTTP transports that a DispatchClient can use to send its POST requests. The default uses the
+# requests module, which is only imported when the first request is sent. A lighter transport built on
+# http.client is provided for short-lived processes that can't afford the import cost of requests. Neither
+# is imported until a transport is actually used.
+#
+# All transports share the same contract: post() returns a response object with status_code, text,
+# cookies and json(), returns None if the request timed out and raises DispatchConnectionException if
+# no connection could be made.
+
+# Our code
+from dispatch_client_py.exceptions import DispatchConnectionException
+
+# Base python
+import urllib.parse
+import json
+
+class RequestsTransport:
+
+	def __init__(self, verify=False):
+		"""Initialize a transport which sends requests with the requests module. The module is imported
+		on the first call to post(), rather than when the client is imported.
+
+		Args:
+			verify (bool, optional): Whether to verify SSL certificates. Default is False
+		"""
+		self.verify = verify
+
+	def post(self, url, data, files, timeout, cookies, headers):
+		"""Send a POST request. This will block until the request returns or times out. Redirects are
+		not followed.
+
+		Args:
+			url (str): The absolute url at which to place this request
+			data (dict): Key/value pairs to send as form data
+			files (dict): Files to be sent with the request
+			timeout (Number): Seconds to wait before giving up
+			cookies (dict): Cookies to send with the request
+			headers (dict): Headers to send with the request
+
+		Raises:
+			DispatchConnectionException if the connection failed.
+
+		Returns:
+			requests.Response: The response, or None if the request timed out.
+		"""
+		import requests
+
+		try:
+			return requests.post(
+				url, data=data,
+				files=files,
+				timeout=timeout,
+				cookies=cookies,
+				allow_redirects=False,
+				verify=self.verify,
+				headers=headers)
+		except (requests.exceptions.Timeout):
+			# Covers both connect and read timeouts. Must come first, as ConnectTimeout is also a ConnectionError.
+			return None
+		except (requests.exceptions.ConnectionError) as e:
+			raise DispatchConnectionException(e)
+
+class HttpClientTransport:
+
+	def __init__(self, verify=False):
+		"""Initialize a minimal transport built on the standard library's http.client. One connection
+		is kept alive per host and reused for every request to it.
+
+		Before a kept-alive connection is reused it is checked for having been closed by the server, and a
+		fresh one is opened if so. A request is only resent if sending it on a reused connection failed,
+		so a request which may already have reached the server is never sent twice.
+
+		This does not support sending files.
+
+		Args:
+			verify (bool, optional): Whether to verify SSL certificates. Default is False
+		"""
+		self.verify = verify
+
+		# Open HTTPConnection's by key: (scheme, netloc)
+		self._connections = {}
+
+	def post(self, url, data, files, timeout, cookies, headers):
+		"""Send a POST request as form data. This will block until the request returns or times out.
+		Redirects are not followed.
+
+		Args:
+			url (str): The absolute url at which to place this request
+			data (dict): Key/value pairs to send as form data
+			files (dict): Must be empty, as files are not supported by this transport.
+			timeout (Number): Seconds to wait before giving up
+			cookies (dict): Cookies to send with the request
+			headers (dict): Headers to send with the request
+
+		Raises:
+			ValueError if files are provided.
+			DispatchConnectionException if the connection failed.
+
+		Returns:
+			HttpClientResponse: The response, or None if the request timed out.
+		"""
+		from http.client import HTTPException
+		import socket
+
+		if(files):
+			raise ValueError("HttpClientTransport does not support sending files. Use RequestsTransport.")
+
+		parts = urllib.parse.urlsplit(url)
+		path = parts.path or '/'
+		if(parts.query): path += '?' + parts.query
+
+		body = urllib.parse.urlencode(data)
+		send_headers = {'Content-Type': 'application/x-www-form-urlencoded'}
+		if(cookies):
+			send_headers['Cookie'] = '; '.join(str(k) + '=' + str(v) for k, v in cookies.items())
+		send_headers.update(headers)
+
+		try:
+			conn, reused = self._get_connection(parts.scheme, parts.netloc, timeout)
+			try:
+				conn.request('POST', path, body=body, headers=send_headers)
+			except (HTTPException, ConnectionError):
+				# The server may have dropped a reused connection since it was checked. Nothing can have
+				# reached the server, so it is safe to send once more on a fresh connection.
+				self._close_connection(parts.scheme, parts.netloc)
+				if(not reused):
+					raise
+				conn, reused = self._get_connection(parts.scheme, parts.netloc, timeout)
+				conn.request('POST', path, body=body, headers=send_headers)
+
+			# Once the request is sent it may have been run, so from here on failures are never retried.
+			r = conn.getresponse()
+			content = r.read()
+		except socket.timeout:
+			self._close_connection(parts.scheme, parts.netloc)
+			return None
+		except (HTTPException, OSError) as e:
+			self._close_connection(parts.scheme, parts.netloc)
+			raise DispatchConnectionException(e)
+
+		if(r.will_close):
+			self._close_connection(parts.scheme, parts.netloc)
+
+		return HttpClientResponse(r.status, r.getheader('Content-Type'), content, r.headers.get_all('Set-Cookie'))
+
+	def close(self):
+		"""Close all kept-alive connections. Safe to call at any time, new connections will be opened
+		as needed.
+		"""
+		for conn in self._connections.values():
+			conn.close()
+		self._connections = {}
+
+	def _get_connection(self, scheme, netloc, timeout):
+		"""Get the kept-alive connection to a host, opening it if needed.
+
+		Args:
+			scheme (str): 'http' or 'https'
+			netloc (str): The host, perhaps with a port
+			timeout (Number): Seconds to wait before giving up on a request
+
+		Returns:
+			tuple: (HTTPConnection, bool) where the bool is True if the connection was already open.
+		"""
+		conn = self._connections.get((scheme, netloc))
+		if(conn is not None and conn.sock is not None):
+			if(_connection_dropped(conn.sock)):
+				self._close_connection(scheme, netloc)
+			else:
+				conn.timeout = timeout
+				conn.sock.settimeout(timeout)
+				return conn, True
+
+		from http.client import HTTPConnection, HTTPSConnection
+		import ssl
+
+		if(scheme == 'https'):
+			if(self.verify):
+				context = ssl.create_default_context()
+			else:
+				context = ssl._create_unverified_context()
+			conn = HTTPSConnection(netloc, timeout=timeout, context=context)
+		else:
+			conn = HTTPConnection(netloc, timeout=timeout)
+
+		self._connections[(scheme, netloc)] = conn
+		return conn, False
+
+	def _close_connection(self, scheme, netloc):
+		"""Close and forget the connection to a host. Safe to call even if there is no connection.
+
+		Args:
+			scheme (str): 'http' or 'https'
+			netloc (str): The host, perhaps with a port
+		"""
+		conn = self._connections.pop((scheme, netloc), None)
+		if(conn is not None):
+			conn.close()
+
+def _connection_dropped(sock):
+	"""Check whether an idle kept-alive socket has been closed by the server. An idle socket should have
+	nothing to read, so if it is readable the server has closed it (or sent something unexpected).
+
+	This uses the selectors module rather than select.select(), which can't handle file descriptors
+	of 1024 or more.
+
+	Args:
+		sock (socket): The socket to check
+
+	Returns:
+		bool: True if the socket should not be reused.
+	"""
+	import selectors
+
+	try:
+		with selectors.DefaultSelector() as selector:
+			selector.register(sock, selectors.EVENT_READ)
+			return len(selector.select(0)) > 0
+	except (OSError, ValueError):
+		return True
+
+class HttpClientResponse:
+
+	def __init__(self, status_code, content_type, content, set_cookies):
+		"""A response returned by HttpClientTransport. This mimics the parts of requests.Response that
+		DispatchClient uses.
+
+		Args:
+			status_code (int): The HTTP status code
+			content_type (str): The Content-Type header, or None
+			content (bytes): The response body
+			set_cookies (list): The values of all Set-Cookie headers, or None
+		"""
+		self.status_code = status_code
+		self.content = content
+		self.encoding = 'utf-8'
+		if(content_type and 'charset=' in content_type):
+			self.encoding = content_type.split('charset=')[-1].split(';')[0].strip()
+
+		# Cookies set by the server, by key: cookie name
+		self.cookies = {}
+		for set_cookie in set_cookies or []:
+			name, _, value = set_cookie.split(';')[0].partition('=')
+			self.cookies[name.strip()] = value.strip()
+
+	@property
+	def text(self):
+		return self.content.decode(self.encoding, errors='replace')
+
+	def json(self):
+		"""Decode the response body as JSON.
+
+		Raises:
+			ValueError if the body is not valid JSON.
+
+		Returns:
+			*: The decoded JSON
+		"""
+		return json.loads(self.text)
@@ -0,0 +1,65 @@
+# tests/conftest.py
+# Josh Reed
+#
+# Shared fixtures for the dispatch client tests.
+
+# Our code
+from dispatch_client_py.dispatch_client import DispatchClient
+
+# Other libraries
+import pytest
+
+# Base python
+import urllib.parse
+import json
+
+class FakeResponse:
+
+	def __init__(self, status_code, body):
+		"""A stand-in for the responses returned by a transport.
+
+		Args:
+			status_code (int): The HTTP status code
+			body (*): Anything JSON serializable, which will be the response body
+		"""
+		self.status_code = status_code
+		self.text = json.dumps(body)
+		self.cookies = {}
+
+	def json(self):
+		return json.loads(self.text)
+
+class FakeTransport:
+
+	def __init__(self):
+		"""A transport which sends nothing. Each post() is recorded and answered with the next queued reply.
+		"""
+		# Replies to hand out, in order. A dict is sent as a 200 JSON body, an int as a bare status code,
+		# None as a timeout and an Exception instance is raised.
+		self.replies = []
+
+		# Each post() as a dict of form {'method', 'params', 'data'} where params is decoded.
+		self.sent = []
+
+	def post(self, url, data, files, timeout, cookies, headers):
+		self.sent.append({
+			'method': data['method'],
+			'params': json.loads(urllib.parse.unquote(data['params'])),
+			'data': dict(data),
+		})
+		reply = self.replies.pop(0)
+		if(reply is None):
+			return None
+		if(isinstance(reply, Exception)):
+			raise reply
+		if(isinstance(reply, int)):
+			return FakeResponse(reply, None)
+		return FakeResponse(200, reply)
+
+@pytest.fixture
+def transport():
+	return FakeTransport()
+
+@pytest.fixture
+def client(transport):
+	return DispatchClient('http://localhost', verbose=False, transport=transport)
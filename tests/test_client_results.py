@@ -0,0 +1,108 @@
+# tests/test_client_results.py
+# Josh Reed
+#
+# Tests for calling bound frontend functions from polls and returning their results to the server.
+
+# Our code
+from dispatch_client_py.exceptions import DispatchServerException
+
+# Other libraries
+import pytest
+
+def poll_reply(*blocks):
+	return {'result': {'queued_functions': list(blocks)}}
+
+def bind_handlers(client):
+	def add(a, b):
+		return a + b
+
+	def boom():
+		raise RuntimeError("boom")
+
+	def unserializable():
+		return object()
+
+	client.client_bind_function(add)
+	client.client_bind_function(boom)
+	client.client_bind_function(unserializable)
+
+def test_result_piggybacked_on_next_poll(client, transport):
+	bind_handlers(client)
+	transport.replies = [
+		poll_reply({'fname': 'add', 'args': [1, 2], 'call_id': 7}),
+		poll_reply(),
+	]
+
+	client._polling_function()
+	assert transport.sent[0]['params'] == [client.session_id, 'py']
+	assert client.client_results_pending == [{'call_id': 7, 'result': 3}]
+
+	client._polling_function()
+	assert transport.sent[1]['method'] == '__dispatch__client_poll'
+	assert transport.sent[1]['params'] == [client.session_id, 'py', [{'call_id': 7, 'result': 3}]]
+	assert client.client_results_pending == []
+
+def test_no_call_id_no_result(client, transport):
+	bind_handlers(client)
+	transport.replies = [poll_reply({'fname': 'add', 'args': [1, 2]})]
+	client._polling_function()
+	assert client.client_results_pending == []
+
+def test_error_codes(client, transport):
+	bind_handlers(client)
+	transport.replies = [poll_reply(
+		{'fname': 'missing', 'args': [], 'call_id': 1},
+		{'fname': 'add', 'args': [1], 'call_id': 2},
+		{'fname': 'boom', 'args': [], 'call_id': 3},
+		{'fname': 'unserializable', 'args': [], 'call_id': 4},
+	)]
+	client._polling_function()
+
+	errors = {r['call_id']: r['error'] for r in client.client_results_pending}
+	assert errors[1]['code'] == -32601
+	assert errors[2]['code'] == -32602
+	assert errors[3]['code'] == -32000
+	assert errors[3]['data'] == 'RuntimeError'
+	assert errors[4]['code'] == -32603
+
+def test_failing_block_does_not_drop_others(client, transport):
+	bind_handlers(client)
+	transport.replies = [poll_reply(
+		{'fname': 'boom', 'args': []},
+		{'fname': 'add', 'args': [1, 2], 'call_id': 7},
+	)]
+	with pytest.raises(RuntimeError):
+		client._polling_function()
+	assert client.client_results_pending == [{'call_id': 7, 'result': 3}]
+
+def test_results_requeued_when_poll_fails(client, transport):
+	bind_handlers(client)
+	client.client_call_bound_function('add', [1, 2], 7)
+	transport.replies = [500, poll_reply({'fname': 'add', 'args': [2, 2], 'call_id': 8}), poll_reply()]
+
+	with pytest.raises(DispatchServerException):
+		client._polling_function()
+	assert client.client_results_pending == [{'call_id': 7, 'result': 3}]
+
+	client._polling_function()
+	assert transport.sent[1]['params'][2] == [{'call_id': 7, 'result': 3}]
+	assert client.client_results_pending == [{'call_id': 8, 'result': 4}]
+
+def test_flush_results(client, transport):
+	bind_handlers(client)
+
+	client.client_flush_results()
+	assert transport.sent == []
+
+	client.client_call_bound_function('add', [1, 2], 7)
+	client.client_call_bound_function('add', [3, 4], 8)
+	transport.replies = [500, {'result': True}]
+
+	with pytest.raises(DispatchServerException):
+		client.client_flush_results()
+	assert len(client.client_results_pending) == 2
+
+	client.client_flush_results()
+	assert transport.sent[1]['method'] == '__dispatch__client_results'
+	assert transport.sent[1]['params'] == [client.session_id, [{'call_id': 7, 'result': 3}, {'call_id': 8, 'result': 7}]]
+	assert client.client_results_pending == []
@@ -0,0 +1,170 @@
+# tests/test_function_registry.py
+# Josh Reed
+#
+# Tests for the registry of frontend functions which the server may call.
+
+# Our code
+from dispatch_client_py.function_registry import DispatchFunctionRegistry, dispatch_callable
+from dispatch_client_py.exceptions import DispatchArgumentException
+
+# Other libraries
+import pytest
+
+# Base python
+import types
+
+def add(a, b=1):
+	return a + b
+
+def test_bind_uses_function_name():
+	registry = DispatchFunctionRegistry()
+	assert registry.bind(add) == 'add'
+	assert 'add' in registry
+	assert registry['add'].fn is add
+	assert list(registry.keys()) == ['add']
+
+def test_bind_rejects_lambda_and_duplicates():
+	registry = DispatchFunctionRegistry()
+	with pytest.raises(ValueError):
+		registry.bind(lambda: None)
+	registry.bind(lambda: None, 'anon')
+	with pytest.raises(ValueError):
+		registry.bind(add, 'anon')
+
+def test_arity_rejection():
+	registry = DispatchFunctionRegistry()
+	registry.bind(add)
+	assert registry.get('add').call([1]) == 2
+	assert registry.get('add').call([1, 2]) == 3
+	with pytest.raises(DispatchArgumentException, match="expected 1 to 2 arguments, got 0"):
+		registry.get('add').call([])
+	with pytest.raises(DispatchArgumentException, match="expected 1 to 2 arguments, got 3"):
+		registry.get('add').call([1, 2, 3])
+
+def test_arity_message_exact_and_varargs():
+	registry = DispatchFunctionRegistry()
+	registry.bind(lambda a: a, 'one')
+	registry.bind(lambda a, *rest: a, 'many')
+	with pytest.raises(DispatchArgumentException, match="expected 1 arguments, got 2"):
+		registry.get('one').call([1, 2])
+	with pytest.raises(DispatchArgumentException, match="expected 1 or more arguments, got 0"):
+		registry.get('many').call([])
+	assert registry.get('many').call([1, 2, 3, 4]) == 1
+
+def test_args_must_be_list():
+	registry = DispatchFunctionRegistry()
+	registry.bind(lambda *a: a, 'f')
+	assert registry.get('f').call(None) == ()
+	with pytest.raises(DispatchArgumentException):
+		registry.get('f').call({'a': 1})
+
+def test_schema_types():
+	registry = DispatchFunctionRegistry()
+	registry.bind(lambda a, b, c: (a, b, c), 'f', [int, (int, float), None])
+	assert registry.get('f').call([1, 2.5, 'x']) == (1, 2.5, 'x')
+	with pytest.raises(DispatchArgumentException, match="argument 0"):
+		registry.get('f').call(['1', 2, 3])
+	with pytest.raises(DispatchArgumentException, match="argument 1"):
+		registry.get('f').call([1, '2', 3])
+
+def test_schema_rejects_bool_for_int():
+	registry = DispatchFunctionRegistry()
+	registry.bind(lambda a: a, 'num', [int])
+	registry.bind(lambda a: a, 'num_or_bool', [(int, bool)])
+	with pytest.raises(DispatchArgumentException):
+		registry.get('num').call([True])
+	assert registry.get('num_or_bool').call([True]) is True
+
+def test_schema_converters():
+	registry = DispatchFunctionRegistry()
+	lookup = {'a': 1}
+	registry.bind(lambda a, b: (a, b), 'f', [float, lookup.__getitem__])
+	assert registry.get('f').call([1.5, 'a']) == (1.5, 1)
+	# A converter raising something other than TypeError/ValueError still counts as a rejection.
+	with pytest.raises(DispatchArgumentException, match="KeyError"):
+		registry.get('f').call([1.5, 'b'])
+	assert registry.get('f').stats()['rejected'] == 1
+
+def test_schema_invalid_at_bind_time():
+	registry = DispatchFunctionRegistry()
+	with pytest.raises(ValueError):
+		registry.bind(lambda a: a, 'f', [(int, 'x')])
+	with pytest.raises(ValueError):
+		registry.bind(lambda a: a, 'g', [()])
+	with pytest.raises(ValueError):
+		registry.bind(lambda a: a, 'h', ['not a spec'])
+	# More schema entries than the function takes arguments.
+	with pytest.raises(ValueError):
+		registry.bind(lambda a: a, 'i', [int, int])
+	registry.bind(lambda a, *rest: a, 'j', [int, int, int])
+
+def test_stats_counting():
+	registry = DispatchFunctionRegistry()
+
+	def boom():
+		raise RuntimeError("boom")
+
+	registry.bind(add)
+	registry.bind(boom)
+	registry.get('add').call([1])
+	registry.get('add').call([1, 2])
+	with pytest.raises(DispatchArgumentException):
+		registry.get('add').call([])
+	with pytest.raises(RuntimeError):
+		registry.get('boom').call([])
+
+	stats = registry.stats()
+	assert stats['add']['calls'] == 2
+	assert stats['add']['rejected'] == 1
+	assert stats['add']['errors'] == 0
+	assert stats['add']['total_time'] >= stats['add']['max_time'] >= 0
+	assert stats['boom']['calls'] == 1
+	assert stats['boom']['errors'] == 1
+
+def test_bind_members_object():
+
+	class Handlers:
+
+		@property
+		def explodes(self):
+			raise RuntimeError("properties must not be evaluated")
+
+		@dispatch_callable
+		def plain(self, a):
+			return a
+
+		@dispatch_callable(function_name='renamed', arg_schema=[int])
+		def original(self, a):
+			return a * 2
+
+		@staticmethod
+		@dispatch_callable
+		def static(a):
+			return a
+
+		def unmarked(self):
+			pass
+
+	registry = DispatchFunctionRegistry()
+	assert sorted(registry.bind_members(Handlers())) == ['plain', 'renamed', 'static']
+	assert registry.get('renamed').call([2]) == 4
+	with pytest.raises(DispatchArgumentException):
+		registry.get('renamed').call(['2'])
+
+def test_bind_members_module_skips_imported():
+	module = types.ModuleType('handlers_module')
+
+	@dispatch_callable
+	def local_fn():
+		pass
+	local_fn.__module__ = 'handlers_module'
+
+	@dispatch_callable
+	def imported_fn():
+		pass
+
+	module.local_fn = local_fn
+	module.imported_fn = imported_fn
+
+	registry = DispatchFunctionRegistry()
+	assert registry.bind_members(module) == ['local_fn']
@@ -0,0 +1,154 @@
+# tests/test_result_cache.py
+# Josh Reed
+#
+# Tests for conditional server calls, the result cache and merge patching.
+
+# Our code
+from dispatch_client_py.result_cache import DispatchResultCache, merge_patch, copy_json
+from dispatch_client_py.exceptions import DispatchResponseErrorException
+
+# Other libraries
+import pytest
+
+# Base python
+import statistics
+import json
+import time
+
+# The test cases from RFC 7396 Appendix A, as (target, patch, result)
+RFC_7396_CASES = [
+	({"a": "b"}, {"a": "c"}, {"a": "c"}),
+	({"a": "b"}, {"b": "c"}, {"a": "b", "b": "c"}),
+	({"a": "b"}, {"a": None}, {}),
+	({"a": "b", "b": "c"}, {"a": None}, {"b": "c"}),
+	({"a": ["b"]}, {"a": "c"}, {"a": "c"}),
+	({"a": "c"}, {"a": ["b"]}, {"a": ["b"]}),
+	({"a": {"b": "c"}}, {"a": {"b": "d", "c": None}}, {"a": {"b": "d"}}),
+	({"a": [{"b": "c"}]}, {"a": [1]}, {"a": [1]}),
+	(["a", "b"], ["c", "d"], ["c", "d"]),
+	({"a": "b"}, ["c"], ["c"]),
+	({"a": "foo"}, None, None),
+	({"a": "foo"}, "bar", "bar"),
+	({"e": None}, {"a": 1}, {"e": None, "a": 1}),
+	([1, 2], {"a": "b", "c": None}, {"a": "b"}),
+	({}, {"a": {"bb": {"ccc": None}}}, {"a": {"bb": {}}}),
+]
+
+@pytest.mark.parametrize("target, patch, expected", RFC_7396_CASES)
+def test_merge_patch_rfc_7396(target, patch, expected):
+	original = copy_json(target)
+	assert merge_patch(target, patch) == expected
+	assert target == original
+
+def test_copy_json_shares_nothing():
+	doc = {'a': [{'b': 1}], 'c': 'd'}
+	copied = copy_json(doc)
+	assert copied == doc
+	copied['a'][0]['b'] = 2
+	assert doc['a'][0]['b'] == 1
+
+def test_cache_lru_eviction():
+	cache = DispatchResultCache(max_entries=2)
+	cache.put('a', 'v1', 1)
+	cache.put('b', 'v1', 2)
+	cache.get('a')
+	cache.put('c', 'v1', 3)
+	assert len(cache) == 2
+	assert cache.get('b') is None
+	assert cache.get('a') == ('v1', 1)
+	assert cache.get('c') == ('v1', 3)
+
+def test_cache_key_ignores_dict_order():
+	cache = DispatchResultCache()
+	assert cache.key('f', [{'a': 1, 'b': 2}]) == cache.key('f', [{'b': 2, 'a': 1}])
+	assert cache.key('f', [1]) != cache.key('g', [1])
+
+def test_not_modified_and_delta(client, transport):
+	transport.replies = [
+		{'result': {'a': 1, 'b': {'c': 2, 'd': 3}}, '__dispatch__etag': 'v1'},
+		{'__dispatch__not_modified': True, '__dispatch__etag': 'v1'},
+		{'__dispatch__delta': {'b': {'c': None, 'e': [1]}}, '__dispatch__etag': 'v2'},
+		{'__dispatch__not_modified': True, '__dispatch__etag': 'v2'},
+	]
+
+	assert client.call_server_function_conditional('doc', 1) == {'a': 1, 'b': {'c': 2, 'd': 3}}
+	assert client.call_server_function_conditional('doc', 1) == {'a': 1, 'b': {'c': 2, 'd': 3}}
+	assert client.call_server_function_conditional('doc', 1) == {'a': 1, 'b': {'d': 3, 'e': [1]}}
+	assert client.call_server_function_conditional('doc', 1) == {'a': 1, 'b': {'d': 3, 'e': [1]}}
+
+	assert [s['data'].get('__dispatch__etag') for s in transport.sent] == [None, 'v1', 'v1', 'v2']
+
+def test_result_mutation_does_not_corrupt_cache(client, transport):
+	transport.replies = [
+		{'result': {'a': {'b': 1}, 'c': [1]}, '__dispatch__etag': 'v1'},
+		{'__dispatch__delta': {'d': 2}, '__dispatch__etag': 'v2'},
+		{'__dispatch__not_modified': True, '__dispatch__etag': 'v2'},
+	]
+
+	first = client.call_server_function_conditional('doc', copy=True)
+	first['a']['b'] = 'changed'
+	first['c'].append(2)
+
+	second = client.call_server_function_conditional('doc', copy=True)
+	assert second == {'a': {'b': 1}, 'c': [1], 'd': 2}
+	second['a']['b'] = 'changed'
+
+	assert client.call_server_function_conditional('doc', copy=True) == {'a': {'b': 1}, 'c': [1], 'd': 2}
+
+def test_not_modified_returns_stored_result(client, transport):
+	transport.replies = [
+		{'result': {'a': [1, 2]}, '__dispatch__etag': 'v1'},
+		{'__dispatch__not_modified': True, '__dispatch__etag': 'v1'},
+	]
+	first = client.call_server_function_conditional('doc')
+	assert client.call_server_function_conditional('doc') is first
+
+def test_not_modified_cheaper_than_full_decode(client, transport):
+	# About 1 MB of JSON.
+	doc = {'rows': [{'id': i, 'name': 'row ' + str(i), 'values': list(range(10))} for i in range(15000)]}
+	text = json.dumps(doc)
+	transport.replies = [{'result': doc, '__dispatch__etag': 'v1'}]
+	client.call_server_function_conditional('doc')
+
+	def timed(fn):
+		times = []
+		for _ in range(5):
+			t_start = time.perf_counter()
+			fn()
+			times.append(time.perf_counter() - t_start)
+		return statistics.median(times)
+
+	def not_modified():
+		transport.replies.append({'__dispatch__not_modified': True, '__dispatch__etag': 'v1'})
+		client.call_server_function_conditional('doc')
+
+	# The not-modified call includes the (fake) transport building and decoding its tiny response.
+	assert timed(not_modified) * 10 < timed(lambda: json.loads(text))
+
+def test_conditional_response_with_nothing_stored(client, transport):
+	transport.replies = [
+		{'__dispatch__not_modified': True, '__dispatch__etag': 'v1'},
+		{'__dispatch__delta': {'a': 1}, '__dispatch__etag': 'v1'},
+	]
+	with pytest.raises(ValueError):
+		client.call_server_function_conditional('doc')
+	with pytest.raises(ValueError):
+		client.call_server_function_conditional('doc')
+
+def test_result_without_etag_not_stored(client, transport):
+	transport.replies = [
+		{'result': {'a': 1}, '__dispatch__etag': 'v1'},
+		{'result': {'a': 2}},
+		{'result': {'a': 3}},
+	]
+	client.call_server_function_conditional('doc')
+	assert len(client.result_cache) == 1
+	assert client.call_server_function_conditional('doc') == {'a': 2}
+	assert len(client.result_cache) == 0
+	client.call_server_function_conditional('doc')
+	assert transport.sent[2]['data'].get('__dispatch__etag') is None
+
+def test_conditional_error(client, transport):
+	transport.replies = [{'error': {'code': -32000, 'message': 'nope'}}]
+	with pytest.raises(DispatchResponseErrorException):
+		client.call_server_function_conditional('doc')
@@ -0,0 +1,189 @@
+# tests/test_transport.py
+# Josh Reed
+#
+# Tests for the HTTP transports, run against a local http.server.
+
+# Our code
+from dispatch_client_py.dispatch_client import DispatchClient
+from dispatch_client_py.transport import HttpClientTransport, RequestsTransport, HttpClientResponse
+from dispatch_client_py.transport import _connection_dropped
+from dispatch_client_py.exceptions import DispatchConnectionException, DispatchResponseTimeoutException
+
+# Other libraries
+import pytest
+
+# Base python
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import threading
+import resource
+import socket
+import os
+import json
+import time
+
+class Handler(BaseHTTPRequestHandler):
+	"""Answers every POST with a JSON body of form {'result': {'path', 'n'}}. Some paths misbehave:
+		/drop: Closes the connection after answering, without saying so in the headers.
+		/crash: Reads the request, then closes the connection without answering.
+		/slow: Waits a second before answering.
+	"""
+
+	protocol_version = 'HTTP/1.1'
+
+	def log_message(self, *args):
+		pass
+
+	def do_POST(self):
+		self.rfile.read(int(self.headers['Content-Length']))
+		self.server.requests.append((self.path, self.client_address))
+		self.server.cookies.append(self.headers.get('Cookie'))
+
+		if(self.path == '/crash'):
+			self.close_connection = True
+			return
+		if(self.path == '/slow'):
+			time.sleep(1)
+
+		body = json.dumps({'result': {'path': self.path, 'n': len(self.server.requests)}}).encode()
+		self.send_response(200)
+		self.send_header('Content-Type', 'application/json; charset=utf-8')
+		self.send_header('Content-Length', str(len(body)))
+		self.send_header('Set-Cookie', 'session=abc123; Path=/; HttpOnly')
+		self.send_header('Set-Cookie', 'theme=dark')
+		self.end_headers()
+		self.wfile.write(body)
+
+		if(self.path == '/drop'):
+			self.close_connection = True
+
+@pytest.fixture
+def server():
+	srv = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+	srv.daemon_threads = True
+	srv.requests = []
+	srv.cookies = []
+	thread = threading.Thread(target=srv.serve_forever, daemon=True)
+	thread.start()
+	yield srv
+	srv.shutdown()
+	srv.server_close()
+
+def url(server, path):
+	return 'http://127.0.0.1:' + str(server.server_port) + path
+
+def post(transport, server, path, timeout=5):
+	return transport.post(url(server, path), {'a': '1'}, {}, timeout, {}, {})
+
+def connections_used(server):
+	return len(set(address for _, address in server.requests))
+
+def test_connection_reused(server):
+	transport = HttpClientTransport()
+	for _ in range(3):
+		assert post(transport, server, '/ok').status_code == 200
+	assert len(server.requests) == 3
+	assert connections_used(server) == 1
+
+def test_reconnect_after_server_drops_connection(server):
+	transport = HttpClientTransport()
+	assert post(transport, server, '/drop').json()['result']['n'] == 1
+	# Give the server a moment to actually close its end.
+	time.sleep(0.1)
+	assert post(transport, server, '/ok').json()['result']['n'] == 2
+	assert len(server.requests) == 2
+	assert connections_used(server) == 2
+
+def test_connection_dropped_check():
+	a, b = socket.socketpair()
+	try:
+		assert not _connection_dropped(a)
+		b.close()
+		assert _connection_dropped(a)
+	finally:
+		a.close()
+
+HIGH_FD = 1500
+
+def high_fd_socket(sock):
+	"""Move a socket to a file descriptor above select.select()'s limit of 1024, or skip the test if the
+	process is not allowed that many.
+	"""
+	soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+	if(soft <= HIGH_FD):
+		if(hard != resource.RLIM_INFINITY and hard <= HIGH_FD):
+			pytest.skip("Can't raise the open file limit above " + str(HIGH_FD))
+		resource.setrlimit(resource.RLIMIT_NOFILE, (HIGH_FD + 1, hard))
+	os.dup2(sock.fileno(), HIGH_FD)
+	moved = socket.socket(fileno=HIGH_FD)
+	sock.close()
+	return moved
+
+def test_reuse_with_high_file_descriptor(server):
+	transport = HttpClientTransport()
+	post(transport, server, '/ok')
+
+	conn = transport._connections[('http', '127.0.0.1:' + str(server.server_port))]
+	conn.sock = high_fd_socket(conn.sock)
+	assert conn.sock.fileno() >= 1024
+
+	assert post(transport, server, '/ok').status_code == 200
+	assert connections_used(server) == 1
+
+def test_no_resend_after_request_was_sent(server):
+	transport = HttpClientTransport()
+	post(transport, server, '/ok')
+	with pytest.raises(DispatchConnectionException):
+		post(transport, server, '/crash')
+	assert [path for path, _ in server.requests].count('/crash') == 1
+
+	# The transport recovers on the next request.
+	assert post(transport, server, '/ok').status_code == 200
+
+def test_timeout_returns_none(server):
+	transport = HttpClientTransport()
+	assert post(transport, server, '/slow', timeout=0.1) is None
+
+def test_connection_refused():
+	sock = socket.socket()
+	sock.bind(('127.0.0.1', 0))
+	port = sock.getsockname()[1]
+	sock.close()
+
+	transport = HttpClientTransport()
+	with pytest.raises(DispatchConnectionException):
+		transport.post('http://127.0.0.1:' + str(port) + '/', {}, {}, 5, {}, {})
+
+def test_set_cookie_parsing(server):
+	r = post(HttpClientTransport(), server, '/ok')
+	assert r.cookies == {'session': 'abc123', 'theme': 'dark'}
+
+def test_response_charset():
+	r = HttpClientResponse(200, 'text/plain; charset=latin-1', 'caf\xe9'.encode('latin-1'), None)
+	assert r.text == 'caf\xe9'
+	assert r.cookies == {}
+
+def test_files_not_supported(server):
+	with pytest.raises(ValueError):
+		HttpClientTransport().post(url(server, '/ok'), {}, {'f': b'x'}, 5, {}, {})
+
+def test_client_over_http_client_transport(server):
+	client = DispatchClient(url(server, ''), dispatch_route='/ok', verbose=False, transport=HttpClientTransport())
+	assert client.call_server_function('f', 1)['path'] == '/ok'
+
+	# Cookies from the server are sent back on later requests.
+	client._cookies = client._last_request.cookies
+	client.call_server_function('f', 1)
+	assert server.cookies == [None, 'session=abc123; theme=dark']
+
+	client = DispatchClient(url(server, ''), dispatch_route='/slow', verbose=False, transport=HttpClientTransport())
+	client.request_timeout = 0.1
+	with pytest.raises(DispatchResponseTimeoutException):
+		client.call_server_function('f')
+
+def test_requests_transport_contract(server):
+	pytest.importorskip('requests')
+	transport = RequestsTransport()
+	assert post(transport, server, '/ok').status_code == 200
+	assert post(transport, server, '/slow', timeout=0.1) is None
+	with pytest.raises(DispatchConnectionException):
+		post(transport, server, '/crash')